@@ -0,0 +1,47 @@
+import re
+
+import pytest
+from hypothesis import given, strategies as st
+
+from atomic_yaml_to_md import slugify_github_anchor
+
+
+def regex_slugify(s: str) -> str:
+    """The original regex pipeline the single-pass slugifier must agree with."""
+    s = s.strip().lower()
+    s = re.sub(r"[^\w\s-]", "", s)
+    s = s.replace(".", "")
+    s = re.sub(r"\s+", "-", s)
+    return re.sub(r"-+", "-", s)
+
+
+@pytest.mark.parametrize(
+    "heading, anchor",
+    [
+        ("Atomic Test #1 - System Service Discovery", "atomic-test-1-system-service-discovery"),
+        ("Atomic Test #2 - System Service Discovery - net.exe", "atomic-test-2-system-service-discovery-netexe"),
+        ("Atomic Test #3 - systemctl/service", "atomic-test-3-systemctlservice"),
+        ("Atomic Test #4 - a -.- b", "atomic-test-4-a-b"),
+        ("Atomic Test #5 - tabs\t\tand\nnewlines", "atomic-test-5-tabs-and-newlines"),
+        ("Atomic Test #6 - snake_case_name", "atomic-test-6-snake_case_name"),
+        ("Atomic Test #7 - trailing -", "atomic-test-7-trailing-"),
+        ("- leading separator", "-leading-separator"),
+        ("  padded heading  ", "padded-heading"),
+        ("Atomic Test #8 - Défense Évasion", "atomic-test-8-défense-évasion"),
+        ("Atomic Test #9 - em — dash", "atomic-test-9-em-dash"),
+        ("", ""),
+    ],
+)
+def test_slugify_known_headings(heading, anchor):
+    assert slugify_github_anchor(heading) == anchor
+    assert regex_slugify(heading) == anchor
+
+
+@given(st.text(alphabet=st.characters(max_codepoint=127)))
+def test_slugify_matches_regex_pipeline_ascii(s):
+    assert slugify_github_anchor(s) == regex_slugify(s)
+
+
+@given(st.text(alphabet=st.sampled_from("aZ9_.- \t\n\x0b\x1c#/()!éß— Ü")))
+def test_slugify_matches_regex_pipeline_separators_and_unicode(s):
+    assert slugify_github_anchor(s) == regex_slugify(s)
@@ -2,18 +2,63 @@
 from __future__ import annotations
 
 import argparse
-import html
+import functools
+import importlib
+import os
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 try:
     import yaml  # PyYAML
 except ImportError as e:
     raise SystemExit("Missing dependency: PyYAML\nInstall: python -m pip install pyyaml") from e
 
-
-TECH_ID_RE = re.compile(r"^T\d{4}(\.\d{3})?$", re.IGNORECASE)
+try:
+    from yaml import CSafeLoader as _SafeLoader  # libyaml-backed, much faster
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
+
+# use with fullmatch(); techniques are upper-case by convention
+TECH_ID_RE = re.compile(r"T\d{4}(?:\.\d{3})?", re.ASCII)
+
+# html.escape(quote=True) plus backslash, applied in a single pass
+_TABLE_TRANS = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+    "'": "&#x27;",
+    "\\": "&#92;",
+})
+# most cells contain none of the above; probe before paying for translate()
+_ESCAPE_PROBE = re.compile(r"[&<>\"'\\]")
+
+_SLUG_STRIP = re.compile(r"[^\w\s-]")
+_SLUG_WS = re.compile(r"\s+")
+_SLUG_DASH = re.compile(r"-+")
+# ASCII byte classes matching \w and \s|- above, for the single-pass slugifier
+_SLUG_KEEP = frozenset(c for c in range(128) if chr(c).isalnum() or chr(c) == "_")
+_SLUG_SEP = frozenset(c for c in range(128) if chr(c).isspace() or chr(c) == "-")
+
+# executor name -> code fence language
+_FENCE = {
+    "command_prompt": "cmd",
+    "cmd": "cmd",
+    "powershell": "powershell",
+    "pwsh": "powershell",
+    "bash": "bash",
+    "sh": "sh",
+}
+
+# one row of the Inputs table
+_INPUT_ROW = "| {name} | {desc} | {type} | {default}|"
+
+# platform spellings that appear in nearly every test
+_PLAT_CANON = {"windows": "Windows", "linux": "Linux", "macos": "macOS"}
 
 
 def slugify_github_anchor(s: str) -> str:
@@ -22,12 +67,25 @@ def slugify_github_anchor(s: str) -> str:
     Matches the style seen in Atomic Red Team MD.
     """
     s = s.strip().lower()
-    # remove special chars except spaces/hyphens
-    s = re.sub(r"[^\w\s-]", "", s)
-    s = s.replace(".", "")  # net.exe -> netexe
-    s = re.sub(r"\s+", "-", s)
-    s = re.sub(r"-+", "-", s)
-    return s
+    if not s.isascii():
+        # remove special chars except spaces/hyphens
+        s = _SLUG_STRIP.sub("", s)
+        s = s.replace(".", "")  # net.exe -> netexe
+        s = _SLUG_WS.sub("-", s)
+        return _SLUG_DASH.sub("-", s)
+
+    # single pass: keep word chars, fold runs of whitespace/hyphens into one "-",
+    # drop everything else (net.exe -> netexe)
+    out = bytearray()
+    dash = False
+    for c in s.encode("ascii"):
+        if c in _SLUG_KEEP:
+            out.append(c)
+            dash = False
+        elif c in _SLUG_SEP and not dash:
+            out.append(0x2D)
+            dash = True
+    return out.decode("ascii")
 
 
 def md_escape_inline(s: Any) -> str:
@@ -40,215 +98,336 @@ def md_escape_table(s: Any) -> str:
     # in their table, backslash is HTML-escaped
     if s is None:
         return ""
-    return html.escape(str(s).strip()).replace("\\", "&#92;")
+    t = str(s).strip()
+    return t if _ESCAPE_PROBE.search(t) is None else t.translate(_TABLE_TRANS)
 
 
 def code_fence_lang(executor_name: str) -> str:
-    name = (executor_name or "").strip().lower()
-    if name in {"command_prompt", "cmd"}:
-        return "cmd"
-    if name in {"powershell", "pwsh"}:
-        return "powershell"
-    if name in {"bash"}:
-        return "bash"
-    if name in {"sh"}:
-        return "sh"
-    return "text"
-
-
-def fmt_supported_platforms(platforms: List[str]) -> str:
+    return _FENCE.get((executor_name or "").strip().lower(), "text")
+
+
+def _titlecase_platform(p: str) -> str:
+    p = p.strip()
+    canon = _PLAT_CANON.get(p)
+    if canon is not None:
+        return canon
+    if p.lower() == "macos":
+        return "macOS"
+    return p[:1].upper() + p[1:]
+
+
+@functools.lru_cache(maxsize=256)
+def fmt_supported_platforms(platforms: Tuple[str, ...]) -> str:
     # Example shows "Windows", "Linux", "macOS"
     if not platforms:
         return ""
-    def titlecase(p: str) -> str:
-        p = p.strip()
-        if p.lower() == "macos":
-            return "macOS"
-        return p[:1].upper() + p[1:]
-    return ", ".join(titlecase(p) for p in platforms)
+    return ", ".join(_titlecase_platform(p) for p in platforms)
 
 
 def read_attack_desc_from_file(p: Path) -> str:
     return p.read_text(encoding="utf-8").strip()
 
 
+def _description_selectolax(page: str) -> str:
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(page)
+    # match BeautifulSoup's get_text(), which skips script/style contents
+    for node in tree.css("script, style"):
+        node.decompose()
+    body = tree.css_first("#description") or tree.css_first("div.description-body")
+    if body:
+        return body.text(separator="\n", strip=True, skip_empty=True)
+    main = tree.css_first("main") or tree
+    ps = main.css("p")
+    return "\n\n".join(p.text(separator=" ", strip=True, skip_empty=True) for p in ps[:2])
+
+
+def _itertext_joined(el: Any, sep: str) -> str:
+    return sep.join(t for t in (x.strip() for x in el.itertext()) if t)
+
+
+def _description_lxml(page: str) -> str:
+    import lxml.html
+    from lxml import etree
+
+    # lxml refuses str input carrying an <?xml encoding=...?> declaration, so
+    # hand it UTF-8 bytes with the encoding pinned instead
+    parser = lxml.html.HTMLParser(encoding="utf-8")
+    try:
+        tree = lxml.html.fromstring(page.encode("utf-8"), parser=parser)
+    except etree.ParserError:
+        return ""
+    # match BeautifulSoup's get_text(), which skips script/style contents
+    etree.strip_elements(tree, "script", "style", with_tail=False)
+    body = tree.get_element_by_id("description", None)
+    if body is None:
+        body = next((el for el in tree.find_class("description-body") if el.tag == "div"), None)
+    if body is not None:
+        return _itertext_joined(body, "\n")
+    main = tree.find(".//main")
+    if main is None:
+        main = tree
+    ps = main.findall(".//p")
+    return "\n\n".join(_itertext_joined(p, " ") for p in ps[:2])
+
+
+def _description_bs4(page: str) -> str:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(page, "html.parser")
+
+    # try more specific selectors first; find() avoids compiling CSS selectors
+    body = soup.find(id="description") or soup.find("div", class_="description-body")
+    if body is not None:
+        return "\n".join(body.stripped_strings)
+    # fallback: first paragraphs under main content
+    main = soup.find("main") or soup
+    ps = main.find_all("p", limit=2)
+    return "\n\n".join(" ".join(p.stripped_strings) for p in ps)
+
+
+@functools.lru_cache(maxsize=None)
+def _http_session() -> Any:
+    # shared across calls so keep-alive connections to attack.mitre.org are reused
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    session.headers.update({"User-Agent": "Mozilla/5.0", "Accept-Encoding": "gzip, deflate"})
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    return session
+
+
 def fetch_mitre_description(tech_id: str, timeout: int = 15) -> Optional[str]:
     """
     Optional: fetch description from MITRE ATT&CK technique page.
-    Requires 'requests' + 'beautifulsoup4'.
+    Requires 'requests' + one of 'selectolax', 'lxml' or 'beautifulsoup4' (fastest first).
     If blocked in corporate network, use --attack-desc-file instead.
     """
     try:
-        import requests
-        from bs4 import BeautifulSoup
+        import requests  # noqa: F401
     except Exception:
         return None
+    for module, extract in (
+        ("selectolax.lexbor", _description_selectolax),
+        ("lxml.html", _description_lxml),
+        ("bs4", _description_bs4),
+    ):
+        try:
+            importlib.import_module(module)
+            break
+        except ImportError:
+            continue
+    else:
+        return None
+
+    if not TECH_ID_RE.fullmatch(tech_id):
+        return None
 
     url = f"https://attack.mitre.org/techniques/{tech_id}/"
     try:
-        r = requests.get(url, timeout=timeout, headers={"User-Agent": "Mozilla/5.0"})
+        r = _http_session().get(url, timeout=timeout)
         r.raise_for_status()
     except Exception:
         return None
 
-    soup = BeautifulSoup(r.text, "html.parser")
+    # decode with the declared charset; r.text would run charset detection when none is given
+    page = r.content.decode(r.encoding or "utf-8", errors="replace")
 
     # ATT&CK pages often have a "description-body" section; fallback to first content paragraph.
-    desc = ""
-    # try more specific selectors first
-    body = soup.select_one("#description") or soup.select_one("div.description-body")
-    if body:
-        text = body.get_text("\n", strip=True)
-        desc = text
-    else:
-        # fallback: first paragraphs under main content
-        main = soup.select_one("main") or soup
-        ps = main.select("p")
-        if ps:
-            desc = "\n\n".join(p.get_text(" ", strip=True) for p in ps[:2])
-
+    desc = extract(page)
     return desc.strip() if desc else None
 
 
-def build_markdown(doc: Dict[str, Any], attack_desc: Optional[str] = None) -> str:
+def iter_markdown(doc: Dict[str, Any], attack_desc: Optional[str] = None) -> Iterator[str]:
+    """
+    Yield the markdown document in chunks (roughly one per section) so it can
+    be streamed to a file without materializing the whole string.
+    """
     tech = md_escape_inline(doc.get("attack_technique", ""))
     display = md_escape_inline(doc.get("display_name", doc.get("name", "")))
 
-    lines: List[str] = []
-    lines.append(f"# {tech} - {display}")
-
-    # MITRE Description section
-    lines.append(f"## [Description from ATT&CK](https://attack.mitre.org/techniques/{tech})")
-    lines.append("<blockquote>")
-    lines.append("")
-    if attack_desc:
-        # keep formatting similar; no markdown italics etc
-        lines.append(attack_desc.strip())
-    else:
-        lines.append("")  # keep empty blockquote if not provided
-    lines.append("")
-    lines.append("</blockquote>")
-    lines.append("")
-    lines.append("## Atomic Tests")
-    lines.append("")
+    # MITRE Description section; keep empty blockquote if not provided
+    yield (
+        f"# {tech} - {display}\n"
+        f"## [Description from ATT&CK](https://attack.mitre.org/techniques/{tech})\n"
+        "<blockquote>\n"
+        "\n"
+        f"{attack_desc.strip() if attack_desc else ''}\n"
+        "\n"
+        "</blockquote>\n"
+        "\n"
+        "## Atomic Tests\n"
+        "\n"
+    )
 
     tests: List[Dict[str, Any]] = doc.get("atomic_tests") or []
 
+    # names and anchors are shared by the TOC and the test sections
+    names = [md_escape_inline(t.get("name", f"Atomic Test #{idx}")) for idx, t in enumerate(tests, start=1)]
+    anchors = [slugify_github_anchor(f"Atomic Test #{idx} - {name}") for idx, name in enumerate(names, start=1)]
+
     # TOC list like "- [Atomic Test #1 - Name](#anchor)"
-    for idx, t in enumerate(tests, start=1):
-        name = md_escape_inline(t.get("name", f"Atomic Test #{idx}"))
-        heading = f"Atomic Test #{idx} - {name}"
-        anchor = slugify_github_anchor(heading)
-        lines.append(f"- [Atomic Test #{idx} - {name}](#{anchor})")
-        lines.append("")
-    lines.append("")
-    lines.append("<br/>")
-    lines.append("")
+    yield "".join(
+        f"- [Atomic Test #{idx} - {name}](#{anchor})\n\n"
+        for idx, (name, anchor) in enumerate(zip(names, anchors), start=1)
+    ) + "<br/>\n\n"
 
     # Each atomic test section
-    for idx, t in enumerate(tests, start=1):
-        name = md_escape_inline(t.get("name", f"Atomic Test #{idx}"))
+    for idx, (t, name) in enumerate(zip(tests, names), start=1):
         desc = t.get("description") or ""
         platforms = t.get("supported_platforms") or []
         guid = md_escape_inline(t.get("auto_generated_guid", ""))
 
-        lines.append(f"## Atomic Test #{idx} - {name}")
+        yield f"## Atomic Test #{idx} - {name}\n"
         if desc:
-            lines.append(md_escape_inline(desc))
-            lines.append("")
+            yield f"{md_escape_inline(desc)}\n\n"
         if platforms:
-            lines.append(f"**Supported Platforms:** {fmt_supported_platforms(platforms)}")
-            lines.append("")
+            yield f"**Supported Platforms:** {fmt_supported_platforms(tuple(platforms))}\n\n"
         if guid:
-            lines.append(f"**auto_generated_guid:** {guid}")
-            lines.append("")
-        lines.append("")
-        lines.append("")
-        lines.append("")
-        lines.append("")
+            yield f"**auto_generated_guid:** {guid}\n\n"
 
         # Inputs (if any)
         input_args = t.get("input_arguments") or {}
         if isinstance(input_args, dict) and input_args:
-            lines.append("#### Inputs:")
-            lines.append("| Name | Description | Type | Default Value |")
-            lines.append("|------|-------------|------|---------------|")
+            rows = []
             for k, v in input_args.items():
-                v = v or {}
-                lines.append(
-                    f"| {md_escape_inline(k)} | {md_escape_inline(v.get('description'))} | "
-                    f"{md_escape_inline(v.get('type'))} | {md_escape_table(v.get('default'))}|"
-                )
-            lines.append("")
-            lines.append("")
+                if not isinstance(v, dict):
+                    v = {}
+                rows.append(_INPUT_ROW.format(
+                    name=md_escape_inline(k),
+                    desc=md_escape_inline(v.get("description")),
+                    type=md_escape_inline(v.get("type")),
+                    default=md_escape_table(v.get("default")),
+                ))
+            yield (
+                "#### Inputs:\n"
+                "| Name | Description | Type | Default Value |\n"
+                "|------|-------------|------|---------------|\n"
+                + "\n".join(rows)
+                + "\n\n"
+            )
 
         # Executor section
-        ex = t.get("executor") or {}
-        ex_name = md_escape_inline(ex.get("name", "")) if isinstance(ex, dict) else ""
-        elev = ex.get("elevation_required", None) if isinstance(ex, dict) else None
+        ex = t.get("executor")
+        ex = ex if isinstance(ex, dict) else {}
+        ex_name = md_escape_inline(ex.get("name", ""))
+        elev = ex.get("elevation_required")
 
         # header line like: "#### Attack Commands: Run with `command_prompt`!  Elevation Required ..."
         elev_txt = "  Elevation Required (e.g. root or admin) " if elev is True else ""
         if ex_name:
-            lines.append(f"#### Attack Commands: Run with `{ex_name}`!{elev_txt}")
-            lines.append("")
+            yield f"#### Attack Commands: Run with `{ex_name}`!{elev_txt}\n\n"
         else:
-            lines.append("#### Attack Commands:")
-            lines.append("")
+            yield "#### Attack Commands:\n\n"
 
         # Commands
-        cmd = ex.get("command") if isinstance(ex, dict) else None
+        lang = code_fence_lang(ex_name)
+        cmd = ex.get("command")
         if cmd:
-            lang = code_fence_lang(ex_name)
-            lines.append(f"```{lang}")
-            lines.append(md_escape_inline(cmd))
-            lines.append("```")
-            lines.append("")
+            yield f"```{lang}\n{md_escape_inline(cmd)}\n```\n\n"
 
         # Cleanup
-        cleanup = ex.get("cleanup_command") if isinstance(ex, dict) else None
+        cleanup = ex.get("cleanup_command")
         if cleanup:
-            lines.append("#### Cleanup Commands:")
-            lines.append(f"```{code_fence_lang(ex_name)}")
-            lines.append(md_escape_inline(cleanup))
-            lines.append("```")
-            lines.append("")
-            lines.append("")
+            yield f"#### Cleanup Commands:\n```{lang}\n{md_escape_inline(cleanup)}\n```\n\n"
 
-        lines.append("")
-        lines.append("<br/>")
-        lines.append("<br/>")
-        lines.append("")
+        yield "<br/>\n<br/>\n\n"
 
-    lines.append("<br/>")
-    return "\n".join(lines).rstrip() + "\n"
+    yield "<br/>\n"
 
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("yaml_file", help="Path to Txxxx.yaml")
-    ap.add_argument("--out", help="Output .md path (default: same folder, same name .md)")
-    ap.add_argument("--attack-desc-file", help="Text file containing ATT&CK description to embed")
-    ap.add_argument("--fetch-mitre", action="store_true", help="Try fetching ATT&CK description from MITRE (optional)")
-    args = ap.parse_args()
+def build_markdown(doc: Dict[str, Any], attack_desc: Optional[str] = None) -> str:
+    return "".join(iter_markdown(doc, attack_desc=attack_desc))
+
 
-    ypath = Path(args.yaml_file).resolve()
-    doc = yaml.safe_load(ypath.read_text(encoding="utf-8"))
+def _convert_one(
+    ypath: Path,
+    out: Optional[Path] = None,
+    attack_desc_file: Optional[Path] = None,
+    fetch_mitre: bool = False,
+) -> Path:
+    # PyYAML decodes UTF-8 (BOM-aware) and normalizes line breaks itself
+    doc = yaml.load(ypath.read_bytes(), Loader=_SafeLoader)
     if not isinstance(doc, dict):
-        raise SystemExit("YAML did not parse into an object.")
+        raise SystemExit(f"{ypath}: YAML did not parse into an object.")
 
-    tech = md_escape_inline(doc.get("attack_technique", ""))
+    tech = md_escape_inline(doc.get("attack_technique", "")).upper()
+    if tech and not TECH_ID_RE.fullmatch(tech):
+        raise SystemExit(f"{ypath}: attack_technique {tech!r} is not a technique ID like T1234 or T1234.001.")
     attack_desc = None
 
-    if args.attack_desc_file:
-        attack_desc = read_attack_desc_from_file(Path(args.attack_desc_file))
-    elif args.fetch_mitre and tech:
+    if attack_desc_file:
+        attack_desc = read_attack_desc_from_file(attack_desc_file)
+    elif fetch_mitre and tech:
         attack_desc = fetch_mitre_description(tech)
 
-    md = build_markdown(doc, attack_desc=attack_desc)
+    out = out or ypath.with_suffix(".md")
+    # stream into a sibling temp file and swap it in, so a rendering error
+    # never leaves an existing .md truncated or half-written
+    tmp = out.with_name(f".{out.name}.{os.getpid()}.tmp")
+    try:
+        with tmp.open("w", encoding="utf-8", buffering=1 << 16) as f:
+            f.writelines(iter_markdown(doc, attack_desc=attack_desc))
+        os.replace(tmp, out)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return out
+
+
+def _convert_one_reported(ypath: Path, fetch_mitre: bool = False) -> Tuple[Optional[Path], Optional[str]]:
+    # --dir worker: report a failure for this file instead of aborting the whole batch
+    try:
+        return _convert_one(ypath, fetch_mitre=fetch_mitre), None
+    except SystemExit as e:
+        return None, str(e)
+    except Exception as e:
+        return None, f"{ypath}: {type(e).__name__}: {e}"
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("yaml_file", nargs="?", help="Path to Txxxx.yaml")
+    ap.add_argument("--out", help="Output .md path (default: same folder, same name .md)")
+    ap.add_argument("--attack-desc-file", help="Text file containing ATT&CK description to embed")
+    ap.add_argument("--fetch-mitre", action="store_true", help="Try fetching ATT&CK description from MITRE (optional)")
+    ap.add_argument("--dir", help="Convert every T*.yaml under this directory in parallel (writes side-by-side .md files)")
+    ap.add_argument("--jobs", type=int, help="Worker processes for --dir (default: CPU count)")
+    args = ap.parse_args()
 
-    out = Path(args.out).resolve() if args.out else ypath.with_suffix(".md")
-    out.write_text(md, encoding="utf-8")
+    if bool(args.yaml_file) == bool(args.dir):
+        ap.error("pass either yaml_file or --dir")
+    if args.dir and (args.out or args.attack_desc_file):
+        ap.error("--out and --attack-desc-file only apply to a single yaml_file")
+    if args.dir and not Path(args.dir).is_dir():
+        ap.error(f"--dir {args.dir!r} is not a directory")
+
+    if _SafeLoader is yaml.SafeLoader:
+        print("Warning: PyYAML built without libyaml; using the slower pure-Python loader.", file=sys.stderr)
+
+    if args.dir:
+        files = sorted(Path(args.dir).resolve().rglob("T*.yaml"))
+        convert = functools.partial(_convert_one_reported, fetch_mitre=args.fetch_mitre)
+        failed = 0
+        with ProcessPoolExecutor(max_workers=args.jobs) as ex:
+            for out, err in ex.map(convert, files, chunksize=8):
+                if err is None:
+                    print(f"Wrote: {out}")
+                else:
+                    failed += 1
+                    print(f"Error: {err}", file=sys.stderr)
+        if failed:
+            raise SystemExit(f"{failed} of {len(files)} files failed to convert.")
+        return
+
+    out = _convert_one(
+        Path(args.yaml_file).resolve(),
+        out=Path(args.out).resolve() if args.out else None,
+        attack_desc_file=Path(args.attack_desc_file) if args.attack_desc_file else None,
+        fetch_mitre=args.fetch_mitre,
+    )
     print(f"Wrote: {out}")
 
 